@@ -1,8 +1,5 @@
-import re
 import sys
 
-from PyQt5 import QtWidgets
-
 import ida_kernwin
 
 # this plugin requires Python 3
@@ -13,7 +10,6 @@ try:
     import ida_pro
     import ida_idaapi
 
-    IDA_GLOBAL_SCOPE = sys.modules["__main__"]
     SUPPORTED_IDA = ida_pro.IDA_SDK_VERSION >= 760
 except:
     SUPPORTED_IDA = False
@@ -21,86 +17,133 @@ except:
 # is this deemed to be a compatible environment for the plugin to load?
 SUPPORTED_ENVIRONMENT = bool(SUPPORTED_IDA and SUPPORTED_PYTHON)
 
+# ------------------------------------------------------------------------------
+# Key Bindings
+# ------------------------------------------------------------------------------
+
+# (IDA action name, key sequence) pairs
+_DEFAULT_BINDINGS = (
+    ("ChooserEdit", "Meta+e, c"),
+    ("Edit/Plugins/IDA Patcher", "Meta+P, P"),
+    ("Edit/Plugins/Signature Maker", "Meta+P, S"),
+    ("EditEnum", "Meta+E, N"),
+    ("EditSegment", "Meta+E, S"),
+    ("ExpandStruct", "Meta+E, E"),
+    ("JumpEntryPoint", "Meta+G, E"),
+    ("JumpFunction", "Meta+G, F"),
+    ("JumpOpXref", "Meta+g, x"),  # Go to Xref
+    ("JumpText", "Meta+G, T"),
+    ("SetSegmentRegister", "Meta+E, R"),
+    ("TracingMainTracebufChangeDesc", "Meta+E, T"),
+    ("watch:Edit", "Meta+E, W"),
+)
+
 # ------------------------------------------------------------------------------
 # IDA Plugin Stub
 # ------------------------------------------------------------------------------
 
 class KeyHooker(ida_kernwin.UI_Hooks):
-    _TILDE_PATTERN_rgx = re.compile(r"~(.*?)~")
-
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.LABEL_TO_ACTION = {}
-        self.ACTIONS = {}        
+        self.ACTIONS = {}
+        self._bindings = _DEFAULT_BINDINGS
+        self._hooked = False
+
+    def hook(self):
+        self._hooked = super().hook()
+        return self._hooked
+
+    def unhook(self):
+        # ready_to_run() unhooks early, term() must not unhook a second time
+        if not self._hooked:
+            return False
+        self._hooked = not super().unhook()
+        return not self._hooked
 
     def enumerate_actions(self):
+        # Qt is imported here rather than at plugin load, see ready_to_run()
+        from PyQt5 import QtWidgets
+
         # Get the instance of the QApplication
         main_window = QtWidgets.QApplication.instance()
 
-        widgets = [main_window]
-        while widgets:
-            widget = widgets.pop(0)
-            widgets.extend(list(widget.findChildren(QtWidgets.QAction)))
-            if not isinstance(widget, QtWidgets.QAction):
-                continue
-            if widget.shortcut().isEmpty():
-                continue
-
-            self.LABEL_TO_ACTION[widget.text()] = widget
+        # findChildren() already walks the whole object tree recursively
+        text = QtWidgets.QAction.text
+        shortcut = QtWidgets.QAction.shortcut
+        self.LABEL_TO_ACTION = {
+            text(action): action
+            for action in main_window.findChildren(QtWidgets.QAction)
+            if not shortcut(action).isEmpty()
+        }
 
     @staticmethod
     def replace_tilde_with_ampersand(text):
-        # Define a pattern that matches text between ~ and ~
-        # The lambda function prefixes the matched text (group 1) with &
-        replaced_text = KeyHooker._TILDE_PATTERN_rgx.sub(lambda match: f"&{match.group(1)}", text)
-        return replaced_text
+        # most labels have no mnemonic at all
+        if not text or "~" not in text:
+            return text
+        # a ~X~ pair never spans a newline, so each line is paired on its own
+        return "\n".join(
+            KeyHooker._replace_line_tildes(line) for line in text.split("\n")
+        )
 
-    def run(self):
-        # ida_kernwin.update_action_shortcut("JumpOpXref", "Meta+g, x")
+    @staticmethod
+    def _replace_line_tildes(line):
+        # every ~X~ pair becomes &X, an unpaired trailing ~ is kept as is
+        parts = line.split("~")
+        tail = ""
+        if len(parts) % 2 == 0:
+            tail = "~" + parts.pop()
+        return "".join(
+            part if i % 2 == 0 else "&" + part for i, part in enumerate(parts)
+        ) + tail
+
+    def resolve_bound_actions(self, action_names):
+        """
+        Map each of the given IDA action names to the QAction that backs it.
+        """
         self.enumerate_actions()
-        for action_name in ida_kernwin.get_registered_actions():
+        warnings = []
+        for action_name in action_names:
             if not ida_kernwin.get_action_shortcut(action_name):
+                warnings.append(f"WARNING: action {action_name} is not registered or has no shortcut.")
                 continue
             # labels have ~ between the mnemonic shortkey identifier
             label = ida_kernwin.get_action_label(action_name)
             label = self.replace_tilde_with_ampersand(label)
             action = self.LABEL_TO_ACTION.get(label)
             if not action:
-                print(
-                    "WARNING: action ",
-                    action_name,
-                    "(",
-                    label,
-                    ") not found in action widgets.",
-                )
+                warnings.append(f"WARNING: action {action_name} ({label}) not found in action widgets.")
             else:
                 self.ACTIONS[action_name] = action
 
-        print(f"[+] {KeybinderPlugin.wanted_name} by mahmoudimus. Setting shortcuts.")
-
-        # Now proceed to set shortcuts
-        self.ACTIONS["ChooserEdit"].setShortcut("Meta+e, c")
-        self.ACTIONS["Edit/Plugins/IDA Patcher"].setShortcut("Meta+P, P")
-        self.ACTIONS["Edit/Plugins/Signature Maker"].setShortcut("Meta+P, S")
-        self.ACTIONS["EditEnum"].setShortcut("Meta+E, N")
-        self.ACTIONS["EditSegment"].setShortcut("Meta+E, S")
-        self.ACTIONS["ExpandStruct"].setShortcut("Meta+E, E")
-        self.ACTIONS["JumpEntryPoint"].setShortcut("Meta+G, E")
-        self.ACTIONS["JumpFunction"].setShortcut("Meta+G, F")
-        self.ACTIONS["JumpOpXref"].setShortcut("Meta+g, x")  # Go to Xref
-        self.ACTIONS["JumpText"].setShortcut("Meta+G, T")
-        self.ACTIONS["SetSegmentRegister"].setShortcut("Meta+E, R")
-        self.ACTIONS["TracingMainTracebufChangeDesc"].setShortcut("Meta+E, T")
-        self.ACTIONS["watch:Edit"].setShortcut("Meta+E, W")    
+        # every write to the output window is a round trip into IDA, batch them
+        if warnings:
+            print("\n".join(warnings))
 
-    def ready_to_run(self):
-        self.run()
+    def run(self):
+        # go through the QActions directly, IDA's own shortcut handling does
+        # not deal with Emacs-like key chord sequences
+        self.resolve_bound_actions(action_name for action_name, _ in self._bindings)
 
-    def get_lines_rendering_info(self, out, widget, rin):
-        pass
+        from PyQt5 import QtGui
 
-    def populating_widget_popup(self, widget, popup, ctx):
-        pass
+        applied = 0
+        for action_name, shortcut in self._bindings:
+            action = self.ACTIONS.get(action_name)
+            if action:
+                action.setShortcut(QtGui.QKeySequence(shortcut))
+                applied += 1
+
+        print(
+            f"[+] {KeybinderPlugin.wanted_name} by mahmoudimus. "
+            f"Applied {applied}/{len(self._bindings)} shortcuts."
+        )
+
+    def ready_to_run(self):
+        self.run()
+        # the shortcuts are set, stop receiving UI events for the session
+        self.unhook()
 
 
 class KeybinderPlugin(ida_idaapi.plugin_t):
@@ -122,7 +165,8 @@ class KeybinderPlugin(ida_idaapi.plugin_t):
     wanted_hotkey = ""
 
     def __init__(self):
-        self.__updated = getattr(IDA_GLOBAL_SCOPE, "RESTART_REQUIRED", False)
+        # read on every construction, an updater may set it mid-session
+        self.__updated = getattr(sys.modules.get("__main__"), "RESTART_REQUIRED", False)
 
     # --------------------------------------------------------------------------
     # IDA Plugin Overloads
@@ -152,7 +196,7 @@ class KeybinderPlugin(ida_idaapi.plugin_t):
         """
         This is called by IDA when it is unloading the plugin.
         """
-        pass
+        self._ui_hook.unhook()
 
 
 def PLUGIN_ENTRY():